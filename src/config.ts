@@ -21,6 +21,10 @@ interface Config {
   STREAMER_ENTRYPOINT: string | null;
   ANONYMIZATION_MASK: string;
   PORT: number;
+  /**
+   * Number of processes serving the web app, one by default
+   */
+  NB_WORKERS: number;
   APP_HOSTNAME: string;
   DB_USERNAME: string;
   DB_PASSWORD: string;
@@ -51,6 +55,7 @@ const config: Config = {
   AUTH_CALLBACK: "http://localhost:5000/github/auth",
   ANONYMIZATION_MASK: "XXXX",
   PORT: 5000,
+  NB_WORKERS: 1,
   TRUST_PROXY: 1,
   RATE_LIMIT: 350,
   APP_HOSTNAME: "anonymous.4open.science",
@@ -1,9 +1,10 @@
-import { join, basename, dirname } from "path";
+import { posix } from "path";
 import { Response } from "express";
 import { Readable } from "stream";
 import { trace } from "@opentelemetry/api";
 import { lookup } from "mime-types";
 import got from "got";
+import * as sha1 from "crypto-js/sha1";
 
 import Repository from "./Repository";
 import { RepositoryStatus } from "./types";
@@ -15,6 +16,25 @@ import FileModel from "./model/files/files.model";
 import { IFile } from "./model/files/files.types";
 import { FilterQuery } from "mongoose";
 
+// the paths of the files in a repository always use "/"
+const { join, basename, dirname } = posix;
+
+const IMAGE_EXTENSIONS = new Set([
+  "png",
+  "jpg",
+  "jpeg",
+  "gif",
+  "svg",
+  "ico",
+  "bmp",
+  "tiff",
+  "tif",
+  "webp",
+  "avif",
+  "heif",
+  "heic",
+]);
+
 /**
  * Represent a file in a anonymized repository
  */
@@ -74,7 +94,7 @@ export default class AnonymizedFile {
           path: fileDir,
         };
         if (filename != "") query.name = filename;
-        const res = await FileModel.findOne(query);
+        const res = await FileModel.findOne(query).lean<IFile>().exec();
         if (res) {
           this._file = res;
           return res;
@@ -103,7 +123,9 @@ export default class AnonymizedFile {
         repoId: this.repository.repoId,
         path: new RegExp(pathQuery),
         name: new RegExp(nameQuery),
-      }).exec();
+      })
+        .lean<IFile[]>()
+        .exec();
 
       for (const candidate of candidates) {
         const candidatePath = join(candidate.path, candidate.name);
@@ -127,6 +149,32 @@ export default class AnonymizedFile {
     }
   }
 
+  /**
+   * Compute the ETag of the anonymized content
+   *
+   * @returns an ETag that changes with the file and the anonymization options
+   */
+  async etag(): Promise<string | undefined> {
+    const sha = await this.sha();
+    if (!sha) return undefined;
+    const options = this.repository.options;
+    const hash = sha1(
+      JSON.stringify([
+        sha,
+        // the sha of downloaded files is an inode number that can be reused
+        // after a reset, the commit and the size tell their content apart
+        this.repository.model.source.commit,
+        this._file?.size,
+        options.terms,
+        options.image,
+        options.link,
+        this.repository.model.source.repositoryName,
+        this.repository.model.source.branch,
+      ])
+    ).toString();
+    return `"${hash}"`;
+  }
+
   /**
    * De-anonymize the path
    *
@@ -154,26 +202,10 @@ export default class AnonymizedFile {
   }
   extension() {
     const filename = basename(this._file?.name || this.anonymizedPath);
-    const extensions = filename.split(".").reverse();
-    return extensions[0].toLowerCase();
+    return filename.substring(filename.lastIndexOf(".") + 1).toLowerCase();
   }
   isImage() {
-    const extension = this.extension();
-    return [
-      "png",
-      "jpg",
-      "jpeg",
-      "gif",
-      "svg",
-      "ico",
-      "bmp",
-      "tiff",
-      "tif",
-      "webp",
-      "avif",
-      "heif",
-      "heic",
-    ].includes(extension);
+    return IMAGE_EXTENSIONS.has(this.extension());
   }
 
   isFileSupported() {
@@ -203,8 +235,9 @@ export default class AnonymizedFile {
             });
           }
           const content = await this.repository.source?.getFileContent(this);
+          // only save the repository when its state actually changes
           if (
-            !this.repository.model.isReseted ||
+            this.repository.model.isReseted ||
             this.repository.status != RepositoryStatus.READY
           ) {
             this.repository.model.isReseted = false;
@@ -236,19 +269,23 @@ export default class AnonymizedFile {
     // const ipHost = await cacheableLookup.lookupAsync(hostName);
 
     // use the streamer service
+    const [sha, token] = await Promise.all([
+      this.sha(),
+      this.repository.getToken(),
+    ]);
     return got.stream(join(config.STREAMER_ENTRYPOINT, "api"), {
       method: "POST",
       // lookup: cacheableLookup.lookup,
       // host: ipHost.address,
       // dnsCache: cacheableLookup,
       json: {
-        token: await this.repository.getToken(),
+        token,
         repoFullName: this.repository.model.source.repositoryName,
         commit: this.repository.model.source.commit,
         branch: this.repository.model.source.branch,
         repoId: this.repository.repoId,
         filePath: this.filePath,
-        sha: await this.sha(),
+        sha,
         anonymizerOptions: anonymizer.opt,
       },
     });
@@ -352,9 +389,17 @@ export default class AnonymizedFile {
               reject(error);
               // handleError(error, res);
             }
-            content
-              .on("error", handleStreamError)
-              .pipe(anonymizer)
+            content.on("error", handleStreamError);
+            let output: Readable = content;
+            if (anonymizer.isText === false) {
+              // binary file: nothing to anonymize, stream it as it is
+              if (this._file?.size) {
+                res.header("Content-Length", this._file.size.toString());
+              }
+            } else {
+              output = content.pipe(anonymizer);
+            }
+            output
               .pipe(res)
               .on("error", handleStreamError)
               .on("close", () => {
@@ -0,0 +1,75 @@
+/**
+ * In-memory cache that keeps the most recently used entries
+ */
+export default class LRUCache<K, V> {
+  private entries = new Map<
+    K,
+    { value: V; expiration: number; size: number }
+  >();
+  private totalSize = 0;
+
+  constructor(
+    readonly opt: {
+      /**
+       * The maximum number of entries
+       */
+      max: number;
+      /**
+       * The lifetime of an entry in ms, unlimited by default
+       */
+      ttl?: number;
+      /**
+       * The maximum total size of the entries, unlimited by default
+       */
+      maxSize?: number;
+      /**
+       * The size of an entry, used with maxSize
+       */
+      sizeOf?: (value: V) => number;
+    }
+  ) {}
+
+  get(key: K): V | undefined {
+    const entry = this.entries.get(key);
+    if (!entry) return undefined;
+    if (entry.expiration < Date.now()) {
+      this.delete(key);
+      return undefined;
+    }
+    // move the entry at the end of the map: the most recently used
+    this.entries.delete(key);
+    this.entries.set(key, entry);
+    return entry.value;
+  }
+
+  set(key: K, value: V): V {
+    this.delete(key);
+    const size = this.opt.sizeOf ? this.opt.sizeOf(value) : 1;
+    const maxSize = this.opt.maxSize ?? Infinity;
+    if (size > maxSize) {
+      // the entry alone does not fit in the cache
+      return value;
+    }
+    while (
+      this.entries.size > 0 &&
+      (this.entries.size >= this.opt.max || this.totalSize + size > maxSize)
+    ) {
+      // remove the least recently used entry
+      this.delete(this.entries.keys().next().value);
+    }
+    this.entries.set(key, {
+      value,
+      expiration: this.opt.ttl ? Date.now() + this.opt.ttl : Infinity,
+      size,
+    });
+    this.totalSize += size;
+    return value;
+  }
+
+  delete(key: K) {
+    const entry = this.entries.get(key);
+    if (!entry) return false;
+    this.totalSize -= entry.size;
+    return this.entries.delete(key);
+  }
+}
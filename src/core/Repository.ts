@@ -186,7 +186,8 @@ export default class Repository {
       if (pathQuery !== undefined) {
         query.path = pathQuery;
       }
-      return await FileModel.find(query).exec();
+      // plain objects: skip the hydration of the documents
+      return await FileModel.find(query).lean<IFile[]>().exec();
     } finally {
       span.end();
     }
@@ -4,9 +4,133 @@ import { isText } from "istextorbinary";
 import { trace } from "@opentelemetry/api";
 
 import config from "../config";
+import LRUCache from "./LRUCache";
 
 const urlRegex =
   /<?\b((https?|ftp|file):\/\/)[-A-Za-z0-9+&@#/%?=~_|!:,.;]+[-A-Za-z0-9+&@#/%=~_|]\b\/?>?/g;
+const markdownImageRegex =
+  /!\[[^\]]*\]\((?<filename>.*?)(?=\"|\))(?<optionalpart>\".*\")?\)/g;
+
+const MAX_CACHED_REGEXPS = 1024;
+const regExpCache = new Map<string, RegExp>();
+
+/**
+ * Compile a regular expression once and reuse it for the following calls.
+ *
+ * Global regexes keep their state in `lastIndex`, they should only be used
+ * with `String.replace` which resets it.
+ */
+function cachedRegExp(pattern: string, flags: string) {
+  const key = flags + ":" + pattern;
+  let regex = regExpCache.get(key);
+  if (!regex) {
+    if (regExpCache.size >= MAX_CACHED_REGEXPS) {
+      // evict the oldest regex
+      regExpCache.delete(regExpCache.keys().next().value);
+    }
+    regex = new RegExp(pattern, flags);
+    regExpCache.set(key, regex);
+  }
+  return regex;
+}
+
+const termPatternCache = new Map<string, string>();
+
+/**
+ * Returns the pattern of a term: the term itself if it is a valid regex,
+ * the escaped term otherwise. The result is computed once per term.
+ */
+function termPattern(term: string) {
+  let pattern = termPatternCache.get(term);
+  if (pattern !== undefined) return pattern;
+  try {
+    new RegExp(term);
+    pattern = term;
+  } catch {
+    // escape regex characters
+    pattern = term.replace(/[-[\]{}()*+?.,\\^$|#]/g, "\\$&");
+  }
+  if (termPatternCache.size >= MAX_CACHED_REGEXPS) {
+    // evict the oldest term
+    termPatternCache.delete(termPatternCache.keys().next().value);
+  }
+  termPatternCache.set(term, pattern);
+  return pattern;
+}
+
+/**
+ * Capture groups and backreferences are numbered over the whole regex, they
+ * cannot be merged with the other terms in one alternation.
+ */
+const GROUP_REGEX = /\((?!\?[:=!]|\?<[=!])|\\[1-9]|\\k</;
+
+interface CompiledTerms {
+  /**
+   * Match any of the terms, the group i + 1 captures the matches of terms[i]
+   */
+  any: RegExp;
+  /**
+   * Non-global version of `any`, test() does not depend on lastIndex
+   */
+  anyTest: RegExp;
+  terms: {
+    mask: string;
+    /**
+     * Test if a text contains the term
+     */
+    test: RegExp;
+  }[];
+}
+
+const compiledTermsCache = new LRUCache<string, CompiledTerms | null>({
+  max: 256,
+});
+
+/**
+ * Compile the terms in a single alternation to anonymize a content in one
+ * pass instead of one pass per term.
+ *
+ * Returns null when the terms have to be replaced one by one: no term, a
+ * term with capture groups or backreferences, or an alternation that does
+ * not compile.
+ */
+function compileTerms(terms: string[]) {
+  const key = JSON.stringify(terms);
+  const cached = compiledTermsCache.get(key);
+  if (cached !== undefined) return cached;
+
+  const patterns: string[] = [];
+  const compiled: CompiledTerms["terms"] = [];
+  for (let i = 0; i < terms.length; i++) {
+    const term = terms[i];
+    if (term.trim() == "") {
+      continue;
+    }
+    const pattern = termPattern(term);
+    if (GROUP_REGEX.test(pattern)) {
+      return compiledTermsCache.set(key, null);
+    }
+    // each alternative matches exactly what the term matches on its own
+    patterns.push(`(\\b${pattern}\\b)`);
+    compiled.push({
+      mask: config.ANONYMIZATION_MASK + "-" + (i + 1),
+      test: cachedRegExp(`\\b${pattern}\\b`, "i"),
+    });
+  }
+  if (compiled.length == 0) {
+    return compiledTermsCache.set(key, null);
+  }
+  const any = patterns.join("|");
+  try {
+    return compiledTermsCache.set(key, {
+      any: new RegExp(any, "gi"),
+      anyTest: new RegExp(any, "i"),
+      terms: compiled,
+    });
+  } catch {
+    return compiledTermsCache.set(key, null);
+  }
+}
 
 export function streamToString(stream: Readable): Promise<string> {
   const chunks: Buffer[] = [];
@@ -19,8 +143,9 @@ export function streamToString(stream: Readable): Promise<string> {
 
 export function isTextFile(filePath: string, content?: Buffer) {
   const filename = basename(filePath);
-  const extensions = filename.split(".").reverse();
-  const extension = extensions[0].toLowerCase();
+  const extension = filename
+    .substring(filename.lastIndexOf(".") + 1)
+    .toLowerCase();
   if (config.additionalExtensions.includes(extension)) {
     return true;
   }
@@ -57,10 +182,16 @@ export class AnonymizeTransformer extends Transform {
           this.isText = isTextFile(this.opt.filePath, chunk);
         }
         if (this.isText) {
+          // track the changes of this chunk only
+          const previouslyAnonymized = this.anonimizer.wasAnonymized;
+          this.anonimizer.wasAnonymized = false;
           const content = this.anonimizer.anonymize(chunk.toString());
           if (this.anonimizer.wasAnonymized) {
+            // unchanged chunks are forwarded without being re-encoded
             chunk = Buffer.from(content);
           }
+          this.anonimizer.wasAnonymized =
+            this.anonimizer.wasAnonymized || previouslyAnonymized;
         }
 
         this.emit("transform", {
@@ -94,23 +225,22 @@ export class ContentAnonimizer {
     if (this.opt.image !== false) {
       return content;
     }
+    const mask = config.ANONYMIZATION_MASK;
     // remove image in markdown
-    return content.replace(
-      /!\[[^\]]*\]\((?<filename>.*?)(?=\"|\))(?<optionalpart>\".*\")?\)/g,
-      () => {
-        this.wasAnonymized = true;
-        return config.ANONYMIZATION_MASK;
-      }
-    );
+    return content.replace(markdownImageRegex, () => {
+      this.wasAnonymized = true;
+      return mask;
+    });
   }
   private removeLink(content: string): string {
     if (this.opt.link !== false) {
       return content;
     }
+    const mask = config.ANONYMIZATION_MASK;
     // remove image in markdown
     return content.replace(urlRegex, () => {
       this.wasAnonymized = true;
-      return config.ANONYMIZATION_MASK;
+      return mask;
     });
   }
 
@@ -120,49 +250,70 @@ export class ContentAnonimizer {
     }
     const repoName = this.opt.repoName;
     const branchName = this.opt.branchName;
+    const anonymizedUrl = `https://${config.APP_HOSTNAME}/r/${this.opt.repoId}`;
 
     const replaceCallback = () => {
       this.wasAnonymized = true;
-      return `https://${config.APP_HOSTNAME}/r/${this.opt.repoId}`;
+      return anonymizedUrl;
     };
-    content = content.replace(
-      new RegExp(
-        `https://raw.githubusercontent.com/${repoName}/${branchName}\\b`,
+    // all the self links are replaced in a single pass, the longest
+    // alternatives first
+    return content.replace(
+      cachedRegExp(
+        [
+          `https://raw.githubusercontent.com/${repoName}/${branchName}\\b`,
+          `https://github.com/${repoName}/blob/${branchName}\\b`,
+          `https://github.com/${repoName}/tree/${branchName}\\b`,
+          `https://github.com/${repoName}`,
+        ].join("|"),
         "gi"
       ),
       replaceCallback
     );
-    content = content.replace(
-      new RegExp(`https://github.com/${repoName}/blob/${branchName}\\b`, "gi"),
-      replaceCallback
-    );
-    content = content.replace(
-      new RegExp(`https://github.com/${repoName}/tree/${branchName}\\b`, "gi"),
-      replaceCallback
-    );
-    return content.replace(
-      new RegExp(`https://github.com/${repoName}`, "gi"),
-      replaceCallback
-    );
   }
 
   private replaceTerms(content: string): string {
+    const compiled = compileTerms(this.opt.terms || []);
+    if (!compiled) {
+      return this.replaceTermsOneByOne(content);
+    }
+    // remove whole url if it contains a term
+    content = content.replace(urlRegex, (match) => {
+      if (!compiled.anyTest.test(match)) {
+        return match;
+      }
+      for (const term of compiled.terms) {
+        if (term.test.test(match)) {
+          this.wasAnonymized = true;
+          return term.mask;
+        }
+      }
+      return match;
+    });
+
+    // remove the terms in the text
+    return content.replace(compiled.any, (...groups) => {
+      this.wasAnonymized = true;
+      // the captured group identifies the matched term
+      const term = compiled.terms.find((_, i) => groups[i + 1] !== undefined);
+      return term ? term.mask : config.ANONYMIZATION_MASK;
+    });
+  }
+
+  private replaceTermsOneByOne(content: string): string {
     const terms = this.opt.terms || [];
     for (let i = 0; i < terms.length; i++) {
-      let term = terms[i];
+      const term = terms[i];
       if (term.trim() == "") {
         continue;
       }
       const mask = config.ANONYMIZATION_MASK + "-" + (i + 1);
-      try {
-        new RegExp(term, "gi");
-      } catch {
-        // escape regex characters
-        term = term.replace(/[-[\]{}()*+?.,\\^$|#]/g, "\\$&");
-      }
+      const pattern = `\\b${termPattern(term)}\\b`;
+      // non-global regex: test() does not depend on lastIndex
+      const termTest = cachedRegExp(pattern, "i");
       // remove whole url if it contains the term
       content = content.replace(urlRegex, (match) => {
-        if (new RegExp(`\\b${term}\\b`, "gi").test(match)) {
+        if (termTest.test(match)) {
           this.wasAnonymized = true;
           return mask;
         }
@@ -170,7 +321,7 @@ export class ContentAnonimizer {
       });
 
       // remove the term in the text
-      content = content.replace(new RegExp(`\\b${term}\\b`, "gi"), () => {
+      content = content.replace(cachedRegExp(pattern, "gi"), () => {
         this.wasAnonymized = true;
         return mask;
       });
@@ -204,18 +355,12 @@ export function anonymizePath(path: string, terms: string[]) {
     .startActiveSpan("utils.anonymizePath", (span) => {
       span.setAttribute("path", path);
       for (let i = 0; i < terms.length; i++) {
-        let term = terms[i];
+        const term = terms[i];
         if (term.trim() == "") {
           continue;
         }
-        try {
-          new RegExp(term, "gi");
-        } catch {
-          // escape regex characters
-          term = term.replace(/[-[\]{}()*+?.,\\^$|#]/g, "\\$&");
-        }
         path = path.replace(
-          new RegExp(term, "gi"),
+          cachedRegExp(termPattern(term), "gi"),
           config.ANONYMIZATION_MASK + "-" + (i + 1)
         );
       }
@@ -9,6 +9,8 @@ import { octokit } from "../GitHubUtils";
 import { IRepositoryDocument } from "../model/repositories/repositories.types";
 import RepositoryModel from "../model/repositories/repositories.model";
 
+const GIT_SUFFIX = /\.git$/;
+
 export class GitHubRepository {
   private _data: Partial<{
     [P in keyof IRepositoryDocument]: IRepositoryDocument[P];
@@ -143,15 +145,18 @@ export class GitHubRepository {
     try {
       if (!opt.branch) opt.branch = this._data.defaultBranch || "master";
 
-      const model = await RepositoryModel.findOne({
-        externalId: this.id,
-      }).select("branches");
+      const [model, branches] = await Promise.all([
+        RepositoryModel.findOne({
+          externalId: this.id,
+        }).select("branches"),
+        this.branches(opt),
+      ]);
 
       if (!model) {
         throw new AnonymousError("repo_not_found", { httpStatus: 404 });
       }
 
-      this._data.branches = await this.branches(opt);
+      this._data.branches = branches;
       model.branches = this._data.branches;
 
       const selected = model.branches.filter((f) => f.name == opt.branch)[0];
@@ -193,38 +198,42 @@ export class GitHubRepository {
     }
   }
 
-  public get owner(): string {
+  private _parsedName?: { fullName: string; owner: string; repo: string };
+
+  /**
+   * Parse the full name of the repository once and reuse it for the
+   * following calls to `owner` and `repo`.
+   */
+  private parsedName() {
     if (!this.fullName) {
       throw new AnonymousError("invalid_repo", {
         httpStatus: 400,
         object: this,
       });
     }
-    const repo = gh(this.fullName);
-    if (!repo) {
-      throw new AnonymousError("invalid_repo", {
-        httpStatus: 400,
-        object: this,
-      });
+    if (this._parsedName?.fullName !== this.fullName) {
+      const repo = gh(this.fullName);
+      if (!repo) {
+        throw new AnonymousError("invalid_repo", {
+          httpStatus: 400,
+          object: this,
+        });
+      }
+      this._parsedName = {
+        fullName: this.fullName,
+        owner: repo.owner || this.fullName,
+        repo: repo.name || this.fullName,
+      };
     }
-    return repo.owner || this.fullName;
+    return this._parsedName;
+  }
+
+  public get owner(): string {
+    return this.parsedName().owner;
   }
 
   public get repo(): string {
-    if (!this.fullName) {
-      throw new AnonymousError("invalid_repo", {
-        httpStatus: 400,
-        object: this,
-      });
-    }
-    const repo = gh(this.fullName);
-    if (!repo) {
-      throw new AnonymousError("invalid_repo", {
-        httpStatus: 400,
-        object: this,
-      });
-    }
-    return repo.name || this.fullName;
+    return this.parsedName().repo;
   }
 }
 
@@ -241,9 +250,7 @@ export async function getRepositoryFromGitHub(opt: {
   span.setAttribute("owner", opt.owner);
   span.setAttribute("repo", opt.repo);
   try {
-    if (opt.repo.indexOf(".git") > -1) {
-      opt.repo = opt.repo.replace(".git", "");
-    }
+    opt.repo = opt.repo.replace(GIT_SUFFIX, "");
     let dbModel = null;
     if (opt.repositoryID) {
       dbModel = isConnected
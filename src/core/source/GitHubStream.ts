@@ -1,9 +1,9 @@
 import AnonymizedFile from "../AnonymizedFile";
 import GitHubBase, { GitHubBaseData } from "./GitHubBase";
 import storage from "../storage";
-import * as path from "path";
 import got from "got";
-import { basename, dirname } from "path";
+// the paths of the files in a repository always use "/"
+import { posix as path } from "path";
 
 import * as stream from "stream";
 import AnonymousError from "../AnonymousError";
@@ -12,6 +12,22 @@ import { FILE_TYPE } from "../storage/Storage";
 import { octokit } from "../GitHubUtils";
 import FileModel from "../model/files/files.model";
 import { IFile } from "../model/files/files.types";
+import LRUCache from "../LRUCache";
+import { RestEndpointMethodTypes } from "@octokit/rest";
+
+type GitHubTree =
+  RestEndpointMethodTypes["git"]["getTree"]["response"]["data"];
+
+// a tree identified by its sha never changes, only its lifetime is limited.
+// A recursive tree can hold up to ~100k entries: the memory of the cache is
+// bounded by the total number of entries of its trees
+const treeCache = new LRUCache<string, GitHubTree>({
+  max: 64,
+  ttl: 10 * 60 * 1000, // 10min
+  maxSize: 50000,
+  sizeOf: (tree) => tree.tree.length,
+});
+const SHA_REGEX = /^[0-9a-f]{40}$/i;
 
 export default class GitHubStream extends GitHubBase {
   type: "GitHubDownload" | "GitHubStream" | "Zip" = "GitHubStream";
@@ -144,23 +160,34 @@ export default class GitHubStream extends GitHubBase {
     sha: string,
     count = { request: 0, file: 0 },
     opt = { recursive: true, callback: () => {} }
-  ) {
+  ): Promise<GitHubTree> {
     const span = trace.getTracer("ano-file").startSpan("GHStream.getGHTree");
     span.setAttribute("sha", sha);
     try {
-      const oct = octokit(await this.data.getToken());
-      const ghRes = await oct.git.getTree({
-        owner: this.data.organization,
-        repo: this.data.repoName,
-        tree_sha: sha,
-        recursive: opt.recursive === true ? "1" : undefined,
-      });
-      count.request++;
-      count.file += ghRes.data.tree.length;
+      // refs like HEAD can move, only cache the trees requested by sha
+      const cacheKey = SHA_REGEX.test(sha)
+        ? `${this.data.repoId}/${sha}/${opt.recursive === true}`
+        : null;
+      let data = cacheKey ? treeCache.get(cacheKey) : undefined;
+      if (!data) {
+        const oct = octokit(await this.data.getToken());
+        const ghRes = await oct.git.getTree({
+          owner: this.data.organization,
+          repo: this.data.repoName,
+          tree_sha: sha,
+          recursive: opt.recursive === true ? "1" : undefined,
+        });
+        count.request++;
+        data = ghRes.data;
+        if (cacheKey) {
+          treeCache.set(cacheKey, data);
+        }
+      }
+      count.file += data.tree.length;
       if (opt.callback) {
         opt.callback();
       }
-      return ghRes.data;
+      return data;
     } finally {
       span.end();
     }
@@ -181,16 +208,28 @@ export default class GitHubStream extends GitHubBase {
     span.setAttribute("sha", sha);
     span.setAttribute("parentPath", parentPath);
     const output: IFile[] = [];
+    const callback = () => {
+      if (progress) {
+        progress("List file: " + count.file);
+      }
+    };
     try {
       let data = null;
       try {
+        // a single recursive request lists the whole repository, unless
+        // GitHub truncates the response
+        data = await this.getGHTree(sha, count, {
+          recursive: true,
+          callback,
+        });
+        if (!data.truncated) {
+          return this.tree2Tree(data.tree, parentPath);
+        }
+        // list the tree folder by folder
+        count.file = 0;
         data = await this.getGHTree(sha, count, {
           recursive: false,
-          callback: () => {
-            if (progress) {
-              progress("List file: " + count.file);
-            }
-          },
+          callback,
         });
         output.push(...this.tree2Tree(data.tree, parentPath));
       } catch (error) {
@@ -215,11 +254,7 @@ export default class GitHubStream extends GitHubBase {
           promises.push(
             this.getGHTree(file.sha, count, {
               recursive: true,
-              callback: () => {
-                if (progress) {
-                  progress("List file: " + count.file);
-                }
-              },
+              callback,
             })
           );
         }
@@ -252,12 +287,12 @@ export default class GitHubStream extends GitHubBase {
     try {
       return tree.map((elem) => {
         const fullPath = path.join(parentPath, elem.path || "");
-        let pathFile = dirname(fullPath);
+        let pathFile = path.dirname(fullPath);
         if (pathFile === ".") {
           pathFile = "";
         }
         return new FileModel({
-          name: basename(fullPath),
+          name: path.basename(fullPath),
           path: pathFile,
           repoId: this.data.repoId,
           size: elem.size,
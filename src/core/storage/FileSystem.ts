@@ -1,17 +1,22 @@
 import config from "../../config";
 import * as fs from "fs";
+import { randomBytes } from "crypto";
 import { Extract } from "unzip-stream";
-import { join, basename, dirname } from "path";
+import { join, basename, dirname, sep } from "path";
 import { Response } from "express";
 import { Readable, pipeline, Transform } from "stream";
 import * as archiver from "archiver";
 import { promisify } from "util";
 import { lookup } from "mime-types";
 import { trace } from "@opentelemetry/api";
+import AnonymousError from "../AnonymousError";
 import StorageBase, { FILE_TYPE } from "./Storage";
 import FileModel from "../model/files/files.model";
 import { IFile } from "../model/files/files.types";
 
+// repoIds cannot contain a dot, this folder never collides with a repository
+const TMP_FOLDER = join(config.FOLDER, ".tmp");
+
 export default class FileSystem extends StorageBase {
   type = "FileSystem";
 
@@ -19,9 +24,26 @@ export default class FileSystem extends StorageBase {
     super();
   }
 
+  /**
+   * Returns the absolute path of p inside the folder of the repository
+   */
+  private fullPath(repoId: string, p: string = "") {
+    // repoPath ends with a separator
+    const repoFolder = join(config.FOLDER, this.repoPath(repoId));
+    const fullPath = join(repoFolder, p);
+    if (!join(fullPath, sep).startsWith(repoFolder)) {
+      // prevent path traversal outside of the repository folder
+      throw new AnonymousError("invalid_path", {
+        httpStatus: 400,
+        object: p,
+      });
+    }
+    return fullPath;
+  }
+
   /** @override */
   async exists(repoId: string, p: string = ""): Promise<FILE_TYPE> {
-    const fullPath = join(config.FOLDER, this.repoPath(repoId), p);
+    const fullPath = this.fullPath(repoId, p);
     return trace
       .getTracer("ano-file")
       .startActiveSpan("fs.exists", async (span) => {
@@ -41,7 +63,7 @@ export default class FileSystem extends StorageBase {
 
   /** @override */
   async send(repoId: string, p: string, res: Response) {
-    const fullPath = join(config.FOLDER, this.repoPath(repoId), p);
+    const fullPath = this.fullPath(repoId, p);
     return trace
       .getTracer("ano-file")
       .startActiveSpan("fs.send", async (span) => {
@@ -57,12 +79,12 @@ export default class FileSystem extends StorageBase {
 
   /** @override */
   async read(repoId: string, p: string): Promise<Readable> {
-    const fullPath = join(config.FOLDER, this.repoPath(repoId), p);
+    const fullPath = this.fullPath(repoId, p);
     return fs.createReadStream(fullPath);
   }
 
   async fileInfo(repoId: string, path: string) {
-    const fullPath = join(config.FOLDER, this.repoPath(repoId), path);
+    const fullPath = this.fullPath(repoId, path);
     const info = await fs.promises.stat(fullPath);
     return {
       size: info.size,
@@ -80,28 +102,72 @@ export default class FileSystem extends StorageBase {
     data: string | Readable
   ): Promise<void> {
     const span = trace.getTracer("ano-file").startSpan("fs.write");
-    const fullPath = join(config.FOLDER, this.repoPath(repoId), p);
-    span.setAttribute("path", fullPath);
+    let tmpPath: string | undefined;
     try {
-      await this.mk(repoId, dirname(p));
-      if (data instanceof Readable) {
-        data.on("error", (err) => {
-          this.rm(repoId, p);
-        });
+      const fullPath = this.fullPath(repoId, p);
+      span.setAttribute("path", fullPath);
+      // write in a temporary file to never expose a partially written file,
+      // outside of the repository folders to keep it out of their listings
+      tmpPath = join(TMP_FOLDER, randomBytes(12).toString("hex"));
+      try {
+        await fs.promises.writeFile(tmpPath, data, "utf-8");
+      } catch (err: any) {
+        if (err.code !== "ENOENT") throw err;
+        // the data is not consumed when the file cannot be opened
+        await fs.promises.mkdir(TMP_FOLDER, { recursive: true });
+        await fs.promises.writeFile(tmpPath, data, "utf-8");
+      }
+      try {
+        await fs.promises.rename(tmpPath, fullPath);
+      } catch (err: any) {
+        if (err.code !== "ENOENT") throw err;
+        // the folder of the file does not exist yet
+        await this.mk(repoId, dirname(p));
+        await fs.promises.rename(tmpPath, fullPath);
       }
-      return await fs.promises.writeFile(fullPath, data, "utf-8");
     } catch (err: any) {
       span.recordException(err);
+      if (tmpPath) {
+        await fs.promises.rm(tmpPath, { force: true });
+      }
       // throw err;
     } finally {
       span.end();
     }
   }
 
+  /**
+   * Remove the temporary files left by interrupted writes
+   *
+   * @param maxAge files not modified for maxAge ms are removed, the recent
+   * ones may still be written
+   */
+  async removeTemporaryFiles(maxAge: number) {
+    let files: string[];
+    try {
+      files = await fs.promises.readdir(TMP_FOLDER);
+    } catch (_) {
+      // nothing was written yet
+      return;
+    }
+    const limit = Date.now() - maxAge;
+    for (const file of files) {
+      const filePath = join(TMP_FOLDER, file);
+      try {
+        const stat = await fs.promises.stat(filePath);
+        if (stat.mtimeMs < limit) {
+          await fs.promises.rm(filePath, { force: true });
+        }
+      } catch (_) {
+        // the file has been renamed in the meantime
+      }
+    }
+  }
+
   /** @override */
   async rm(repoId: string, dir: string = ""): Promise<void> {
     const span = trace.getTracer("ano-file").startSpan("fs.rm");
-    const fullPath = join(config.FOLDER, this.repoPath(repoId), dir);
+    const fullPath = this.fullPath(repoId, dir);
     span.setAttribute("path", fullPath);
     try {
       await fs.promises.rm(fullPath, {
@@ -117,16 +183,15 @@ export default class FileSystem extends StorageBase {
   async mk(repoId: string, dir: string = ""): Promise<void> {
     const span = trace.getTracer("ano-file").startSpan("fs.mk");
     span.setAttribute("path", dir);
-    const fullPath = join(config.FOLDER, this.repoPath(repoId), dir);
+    const fullPath = this.fullPath(repoId, dir);
     try {
+      // recursive: does not fail if the folder already exists
       await fs.promises.mkdir(fullPath, {
         recursive: true,
       });
     } catch (err: any) {
-      if (err.code !== "EEXIST") {
-        span.recordException(err);
-        throw err;
-      }
+      span.recordException(err);
+      throw err;
     } finally {
       span.end();
     }
@@ -144,14 +209,21 @@ export default class FileSystem extends StorageBase {
       .getTracer("ano-file")
       .startActiveSpan("fs.listFiles", async (span) => {
         span.setAttribute("path", dir);
-        const fullPath = join(config.FOLDER, this.repoPath(repoId), dir);
-        let files = await fs.promises.readdir(fullPath);
+        const fullPath = this.fullPath(repoId, dir);
+        const entries = await fs.promises.readdir(fullPath, {
+          withFileTypes: true,
+        });
         const output2: IFile[] = [];
-        for (let file of files) {
-          let filePath = join(fullPath, file);
+        for (const entry of entries) {
+          const file = entry.name;
+          const filePath = join(fullPath, file);
           try {
-            const stats = await fs.promises.stat(filePath);
-            if (stats.isDirectory()) {
+            // directories are known from readdir, only files (for their size)
+            // and symbolic links need a stat
+            const stats = entry.isDirectory()
+              ? null
+              : await fs.promises.stat(filePath);
+            if (!stats || stats.isDirectory()) {
               output2.push(new FileModel({ name: file, path: dir, repoId }));
               output2.push(
                 ...(await this.listFiles(repoId, join(dir, file), opt))
@@ -185,7 +257,7 @@ export default class FileSystem extends StorageBase {
   /** @override */
   async extractZip(repoId: string, p: string, data: Readable): Promise<void> {
     const pipe = promisify(pipeline);
-    const fullPath = join(config.FOLDER, this.repoPath(repoId), p);
+    const fullPath = this.fullPath(repoId, p);
     const extractor = Extract({
       path: fullPath,
       decodeString: (buf) => {
@@ -211,7 +283,7 @@ export default class FileSystem extends StorageBase {
     }
   ) {
     const archive = archiver(opt?.format || "zip", {});
-    const fullPath = join(config.FOLDER, this.repoPath(repoId), dir);
+    const fullPath = this.fullPath(repoId, dir);
 
     await this.listFiles(repoId, dir, {
       onEntry: async (file) => {
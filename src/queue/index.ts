@@ -7,8 +7,11 @@ export let cacheQueue: Queue<Repository>;
 export let removeQueue: Queue<Repository>;
 export let downloadQueue: Queue<Repository>;
 
-// avoid to load the queue outside the main server
-export function startWorker() {
+/**
+ * Create the queues and, when processJobs is true, the workers that process
+ * their jobs. Avoid to load the queue outside the main server.
+ */
+export function startWorker(processJobs = true) {
   const connection = {
     host: config.REDIS_HOSTNAME,
     port: config.REDIS_PORT,
@@ -35,6 +38,8 @@ export function startWorker() {
       removeOnComplete: true,
     },
   });
+  if (!processJobs) return;
+
   const cacheWorker = new Worker<Repository>(
     cacheQueue.name,
     path.resolve("build/queue/processes/removeCache.js"),
@@ -3,7 +3,9 @@ dotenv();
 
 import { createClient } from "redis";
 import { resolve, join } from "path";
-import { existsSync } from "fs";
+import { promises as fs } from "fs";
+import { createHash } from "crypto";
+import type { Cluster } from "cluster";
 import rateLimit from "express-rate-limit";
 import { slowDown } from "express-slow-down";
 import RedisStore from "rate-limit-redis";
@@ -14,19 +16,49 @@ import { connect } from "./database";
 import { initSession, router as connectionRouter } from "./routes/connection";
 import router from "./routes";
 import AnonymizedRepositoryModel from "../core/model/anonymizedRepositories/anonymizedRepositories.model";
-import { conferenceStatusCheck, repositoryStatusCheck } from "./schedule";
+import {
+  conferenceStatusCheck,
+  repositoryStatusCheck,
+  temporaryFilesCleanup,
+} from "./schedule";
 import { startWorker } from "../queue";
 import AnonymizedPullRequestModel from "../core/model/anonymizedPullRequests/anonymizedPullRequests.model";
-import { getUser } from "./routes/route-utils";
+import { getUser, handleError } from "./routes/route-utils";
 import config from "../config";
 
-function indexResponse(req: express.Request, res: express.Response) {
-  if (
-    req.path.startsWith("/script") ||
-    req.path.startsWith("/css") ||
-    req.path.startsWith("/favicon") ||
-    req.path.startsWith("/api")
-  ) {
+// the cluster module has no default export at runtime
+const cluster: Cluster = require("cluster");
+
+const fileCache = new Map<
+  string,
+  { mtimeMs: number; content: Buffer; etag: string }
+>();
+
+/**
+ * Read a file from the disk, the content and its ETag are kept in memory
+ * until the file is modified.
+ */
+async function readCachedFile(path: string) {
+  const stat = await fs.stat(path);
+  const cached = fileCache.get(path);
+  if (cached && cached.mtimeMs === stat.mtimeMs) {
+    return cached;
+  }
+  const content = await fs.readFile(path);
+  const etag = `"${createHash("sha1").update(content).digest("hex")}"`;
+  const file = { mtimeMs: stat.mtimeMs, content, etag };
+  fileCache.set(path, file);
+  return file;
+}
+
+// paths of resources that must not fallback on the index page
+const RESOURCE_PREFIX_REGEX = /^\/(script|css|favicon|api)/;
+
+const INDEX_PATH = resolve("public", "index.html");
+
+async function indexResponse(req: express.Request, res: express.Response) {
+  const path = req.path;
+  if (RESOURCE_PREFIX_REGEX.test(path)) {
     return res.status(404).send("Not found");
   }
   if (
@@ -34,15 +66,21 @@ function indexResponse(req: express.Request, res: express.Response) {
     req.headers["accept"] &&
     req.headers["accept"].indexOf("text/html") == -1
   ) {
-    const repoId = req.path.split("/")[2];
+    const repoId = path.split("/")[2];
     // if it is not an html request, it assumes that the browser try to load a different type of resource
     return res.redirect(
-      `/api/repo/${repoId}/file/${req.path.substring(
-        req.path.indexOf(repoId) + repoId.length + 1
+      `/api/repo/${repoId}/file/${path.substring(
+        path.indexOf(repoId) + repoId.length + 1
       )}`
     );
   }
-  res.sendFile(resolve("public", "index.html"));
+  try {
+    const { content, etag } = await readCachedFile(INDEX_PATH);
+    // express does not hash the content when the ETag is already set
+    res.type("html").set("ETag", etag).send(content);
+  } catch (error) {
+    handleError(error, res, req);
+  }
 }
 
 export default async function start() {
@@ -57,7 +95,9 @@ export default async function start() {
   app.use(passport.initialize());
   app.use(passport.session());
 
-  startWorker();
+  // in a cluster, only the scheduler process handles the jobs of the queues
+  const isScheduler = !cluster.isWorker || process.env.SCHEDULER == "1";
+  startWorker(isScheduler);
 
   const redisClient = createClient({
     socket: {
@@ -169,10 +209,14 @@ export default async function start() {
   apiRouter.use("/pr", speedLimiter, router.pullRequestPrivate);
 
   apiRouter.get("/message", async (_, res) => {
-    if (existsSync("./message.txt")) {
-      return res.sendFile(resolve("message.txt"));
+    let message: Awaited<ReturnType<typeof readCachedFile>>;
+    try {
+      message = await readCachedFile(resolve("message.txt"));
+    } catch (_) {
+      // no message to display
+      return res.sendStatus(404);
     }
-    res.sendStatus(404);
+    res.type("txt").set("ETag", message.etag).send(message.content);
   });
 
   let stat: any = {};
@@ -225,13 +269,50 @@ export default async function start() {
 
   app.get("*", indexResponse);
 
-  // start schedules
-  conferenceStatusCheck();
-  repositoryStatusCheck();
+  // start schedules, only in one process when the app runs in a cluster
+  if (isScheduler) {
+    conferenceStatusCheck();
+    repositoryStatusCheck();
+    temporaryFilesCleanup();
+  }
 
   await connect();
   app.listen(config.PORT);
   console.log("Database connected and Server started on port: " + config.PORT);
 }
 
-start();
+// a worker that runs longer than this is considered healthy
+const WORKER_MIN_UPTIME = 60 * 1000;
+// consecutive early exits of a worker before the primary gives up
+const MAX_WORKER_RESTARTS = 5;
+
+/**
+ * Serve the app from several processes sharing the same port
+ */
+function startCluster(nbWorkers: number) {
+  function fork(env: { SCHEDULER: string }, failures = 0) {
+    const startedAt = Date.now();
+    cluster.fork(env).on("exit", (code, signal) => {
+      failures = Date.now() - startedAt > WORKER_MIN_UPTIME ? 0 : failures + 1;
+      if (failures > MAX_WORKER_RESTARTS) {
+        // e.g. the database is not reachable: let the process manager restart
+        console.error(`Worker exited (${signal || code}) too many times`);
+        process.exit(1);
+      }
+      const delay = 1000 * 2 ** failures;
+      console.error(
+        `Worker exited (${signal || code}), restarting it in ${delay}ms`
+      );
+      setTimeout(() => fork(env, failures), delay);
+    });
+  }
+  for (let i = 0; i < nbWorkers; i++) {
+    fork({ SCHEDULER: i == 0 ? "1" : "0" });
+  }
+}
+
+if (cluster.isPrimary && Number(config.NB_WORKERS) > 1) {
+  startCluster(Number(config.NB_WORKERS));
+} else {
+  start();
+}
@@ -58,6 +58,16 @@ router.get(
         // cache the file for 5min
         res.header("Cache-Control", "max-age=300");
       }
+      const etag = await f.etag();
+      if (etag) {
+        res.header("ETag", etag);
+        if (req.fresh) {
+          // the client already has the anonymized content
+          res.status(304).end();
+          await repo.countView();
+          return;
+        }
+      }
       await f.send(res);
       await repo.countView();
     } catch (error) {
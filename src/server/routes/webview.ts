@@ -1,14 +1,25 @@
 import * as express from "express";
 import { getRepo, handleError } from "./route-utils";
-import * as path from "path";
+import { posix as path } from "path";
 import AnonymizedFile from "../../core/AnonymizedFile";
 import AnonymousError from "../../core/AnonymousError";
 import * as marked from "marked";
+import { createHash } from "crypto";
 import { streamToString } from "../../core/anonymize-utils";
 import { IFile } from "../../core/model/files/files.types";
+import LRUCache from "../../core/LRUCache";
 
 const router = express.Router();
 
+// rendered markdown indexed by the sha1 of the anonymized content
+// bounded by the total length of the pages, a page larger than maxSize is
+// not cached
+const markdownCache = new LRUCache<string, string>({
+  max: 256,
+  maxSize: 50 * 1024 * 1024,
+  sizeOf: (html) => html.length,
+});
+
 const indexPriority = [
   "index.html",
   "index.htm",
@@ -49,7 +60,7 @@ async function webView(req: express.Request, res: express.Response) {
       indexRepoId + req.params.repoId.length + 1
     );
     let requestPath = path.join(wRoot, filePath);
-    if (requestPath.at(0) == "/" || requestPath.at(0) == ".") {
+    if (requestPath.startsWith("/") || requestPath.startsWith(".")) {
       requestPath = requestPath.substring(1);
     }
 
@@ -113,7 +124,14 @@ async function webView(req: express.Request, res: express.Response) {
     }
     if (f.extension() == "md") {
       const content = await streamToString(await f.anonymizedContent());
-      const body = marked.marked(content, { headerIds: false, mangle: false });
+      const key = createHash("sha1").update(content).digest("hex");
+      let body = markdownCache.get(key);
+      if (body === undefined) {
+        body = markdownCache.set(
+          key,
+          marked.marked(content, { headerIds: false, mangle: false })
+        );
+      }
       const html = `<!DOCTYPE html><html><head><title>Content</title></head><link rel="stylesheet" href="/css/all.min.css" /><body><div class="container p-3 file-content markdown-body">${body}<div></body></html>`;
       res.contentType("text/html").send(html);
     } else {
@@ -3,6 +3,8 @@ import Conference from "../core/Conference";
 import AnonymizedRepositoryModel from "../core/model/anonymizedRepositories/anonymizedRepositories.model";
 import ConferenceModel from "../core/model/conference/conferences.model";
 import Repository from "../core/Repository";
+import storage from "../core/storage";
+import FileSystem from "../core/storage/FileSystem";
 
 export function conferenceStatusCheck() {
   // check every 6 hours the status of the conferences
@@ -51,3 +53,15 @@ export function repositoryStatusCheck() {
     });
   });
 }
+
+export function temporaryFilesCleanup() {
+  if (!(storage instanceof FileSystem)) return;
+  const fileSystem = storage;
+  // remove the files left by interrupted writes at startup and every 6 hours
+  const cleanup = () =>
+    fileSystem.removeTemporaryFiles(60 * 60 * 1000).catch((error) => {
+      console.error(error);
+    });
+  cleanup();
+  schedule.scheduleJob("0 */6 * * *", cleanup);
+}
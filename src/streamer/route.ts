@@ -126,9 +126,17 @@ router.post("/", async (req: express.Request, res: express.Response) => {
       }
       handleError(error, res);
     }
-    content
-      .on("error", handleStreamError)
-      .pipe(anonymizer)
+    content.on("error", handleStreamError);
+    let output: stream.Readable = content;
+    if (anonymizer.isText === false) {
+      // binary file: nothing to anonymize, stream it as it is
+      if (!mime) {
+        res.contentType("application/octet-stream");
+      }
+    } else {
+      output = content.pipe(anonymizer);
+    }
+    output
       .pipe(res)
       .on("error", handleStreamError)
       .on("close", () => {
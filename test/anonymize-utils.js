@@ -0,0 +1,36 @@
+require("ts-node/register/transpile-only");
+const assert = require("assert");
+const { ContentAnonimizer } = require("../src/core/anonymize-utils");
+const config = require("../src/config").default;
+
+const mask = config.ANONYMIZATION_MASK;
+
+function anonymize(content, terms) {
+  return new ContentAnonimizer({ terms }).anonymize(content);
+}
+
+describe("ContentAnonimizer", function () {
+  describe("terms containing |", function () {
+    it("masks each alternative like the term alone", function () {
+      assert.equal(
+        anonymize("alicesmith and bob", ["alice|bob"]),
+        `${mask}-1smith and ${mask}-1`
+      );
+    });
+
+    it("masks the urls that contain an alternative", function () {
+      assert.equal(
+        anonymize("see https://example.com/jimbob/paper", ["alice|bob"]),
+        `see ${mask}-1`
+      );
+    });
+
+    it("does not depend on the other terms", function () {
+      const content = "alicesmith https://example.com/jimbob/paper";
+      assert.equal(
+        anonymize(content, ["alice|bob"]),
+        anonymize(content, ["alice|bob", "(x)"])
+      );
+    });
+  });
+});